@@ -13,21 +13,29 @@ Python-MATLAB整合橋接器
 import numpy as np
 import matlab.engine
 import asyncio
+import base64
+import hashlib
 import threading
-import queue
 import json
 import time
 import logging
+import operator
+import os
+import sys
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Callable, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Callable, Any, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 import websockets
 import zmq
+import zmq.asyncio
 
 # 嘗試導入可選依賴
 try:
     import rclpy
     from rclpy.node import Node
+    from rclpy.qos import QoSProfile, ReliabilityPolicy, DurabilityPolicy
     from geometry_msgs.msg import Point, Quaternion, Pose, PoseStamped
     from nav_msgs.msg import Path
     from std_msgs.msg import String, Header
@@ -50,11 +58,111 @@ try:
 except ImportError:
     CUPY_AVAILABLE = False
 
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # 設置日誌
 logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _json_default(obj):
+    """標準json後備序列化 (處理numpy類型)"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"無法序列化類型: {type(obj).__name__}")
+
+def _dumps(obj) -> bytes:
+    """序列化為JSON位元組，優先使用orjson並直接處理numpy陣列"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+    return json.dumps(obj, default=_json_default).encode('utf-8')
+
+def _loads(data: Union[bytes, str]) -> Any:
+    """解析JSON (bytes或str皆可直接傳入)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _msgpack_default(obj):
+    """msgpack後備序列化 (DroneState轉為定長陣列，numpy類型轉為原生值)"""
+    if isinstance(obj, DroneState):
+        return _pack_drone_state(obj)
+    return _json_default(obj)
+
+def _pack(obj) -> bytes:
+    """序列化為二進位負載 (msgpack不可用時退回JSON)"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(obj, use_bin_type=True, default=_msgpack_default)
+    return _dumps(obj)
+
+def _unpack(payload: bytes) -> Any:
+    """反序列化_pack產生的負載"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.unpackb(payload, raw=False)
+    return _loads(payload)
+
+def mldouble_to_np(md) -> np.ndarray:
+    """將matlab.double轉為numpy陣列 (共用底層緩衝區，不逐元素複製)"""
+    data = getattr(md, '_data', None)
+    if data is None:
+        # 新版引擎的matlab.double直接支援緩衝區協議
+        return np.asarray(md, dtype=np.float64)
+    
+    # _data為按列優先存放的array.array('d')
+    return np.frombuffer(data, dtype=np.float64).reshape(md.size[::-1]).T
+
+_MLDOUBLE_FROM_BUFFER = True  # 引擎不支援numpy初始化時於首次失敗後關閉
+
+def np_to_mldouble(array: np.ndarray):
+    """將numpy陣列轉為matlab.double
+    
+    新版引擎 (R2022a+) 直接從緩衝區整塊複製；舊版只接受嵌套列表，退回tolist逐元素轉換
+    """
+    global _MLDOUBLE_FROM_BUFFER
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    if _MLDOUBLE_FROM_BUFFER:
+        try:
+            return matlab.double(array)
+        except (TypeError, ValueError):
+            _MLDOUBLE_FROM_BUFFER = False
+    return matlab.double(array.tolist())
+
 @dataclass
 class DroneState:
     """無人機狀態數據類"""
@@ -68,7 +176,15 @@ class DroneState:
     armed: bool = False
     gps_fix: int = 0
 
-@dataclass
+def _pack_drone_state(state: DroneState) -> Tuple:
+    """DroneState的緊湊表示: (drone_id, timestamp, position, velocity, attitude, battery_voltage, flight_mode, armed, gps_fix)"""
+    return (state.drone_id, state.timestamp, state.position.tolist(), state.velocity.tolist(),
+            state.attitude.tolist(), state.battery_voltage, state.flight_mode, state.armed, state.gps_fix)
+
+# Python 3.10+ 的dataclass支援slots，減少每個實例的記憶體與屬性查找開銷
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class MissionWaypoint:
     """任務航點數據類"""
     sequence: int
@@ -82,14 +198,338 @@ class MissionWaypoint:
     param4: float = 0.0
     autocontinue: bool = True
 
+# 航點欄位 (SoA) 名稱與型別: 每欄為一個連續的numpy陣列
+WAYPOINT_COLUMNS = (
+    ('seq', 'sequence', np.int32),
+    ('lat', 'lat', np.float64),
+    ('lon', 'lon', np.float64),
+    ('alt', 'alt', np.float32),
+    ('command', 'command', np.uint16),
+)
+
+def waypoint_columns(waypoints: List[MissionWaypoint]) -> Dict[str, np.ndarray]:
+    """將航點列表轉為平行欄位陣列 (AoS -> SoA)"""
+    n = len(waypoints)
+    return {
+        key: np.fromiter(map(operator.attrgetter(attr), waypoints), dtype, count=n)
+        for key, attr, dtype in WAYPOINT_COLUMNS
+    }
+
+# 任務存儲用的緊湊結構化記錄 (與MISSION_RING_DTYPE相同，但不含drone_id)
+WP_DTYPE = np.dtype([
+    ('seq', '<u4'), ('lat', '<f8'), ('lon', '<f8'), ('alt', '<f4'), ('cmd', '<u2')
+])
+
+def waypoint_records(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """由航點欄位陣列組成WP_DTYPE結構化陣列"""
+    records = np.empty(len(columns['seq']), dtype=WP_DTYPE)
+    records['seq'] = columns['seq']
+    records['lat'] = columns['lat']
+    records['lon'] = columns['lon']
+    records['alt'] = columns['alt']
+    records['cmd'] = columns['command']
+    return records
+
+# 不在SoA欄位中但會隨MAVLink發送的航點參數
+_WAYPOINT_PARAMS = operator.attrgetter('param1', 'param2', 'param3', 'param4', 'autocontinue')
+
+def mission_digest(waypoints: List[MissionWaypoint], columns: Dict[str, np.ndarray]) -> int:
+    """計算任務內容的64位元雜湊 (xxh3不可用時退回blake2b)"""
+    params = np.array(list(map(_WAYPOINT_PARAMS, waypoints)), dtype=np.float64)
+    buffers = [columns[key].data for key, _, _ in WAYPOINT_COLUMNS]
+    buffers.append(params.data)
+    
+    hasher = xxhash.xxh3_64() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=8)
+    for buf in buffers:
+        hasher.update(buf)
+    return int.from_bytes(hasher.digest(), 'little')
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, nogil=True)
+    def first_invalid_waypoint(lat, lon, alt) -> int:
+        """返回第一個超出範圍的航點索引 (全部有效時返回-1)"""
+        for i in range(lat.size):
+            if not (-90.0 <= lat[i] <= 90.0 and -180.0 <= lon[i] <= 180.0 and alt[i] >= 0.0):
+                return i
+        return -1
+else:
+    def first_invalid_waypoint(lat, lon, alt) -> int:
+        """返回第一個超出範圍的航點索引 (全部有效時返回-1)"""
+        valid = (lat >= -90.0) & (lat <= 90.0) & (lon >= -180.0) & (lon <= 180.0) & (alt >= 0.0)
+        invalid = np.flatnonzero(~valid)
+        return int(invalid[0]) if invalid.size else -1
+
+MAX_DRONES = 256  # 狀態表初始容量
+STATE_BUFFER_COLUMNS = 10  # position(3) + velocity(3) + attitude(3) + timestamp
+MATLAB_B64_THRESHOLD = 64  # 狀態列數達此值時改以base64二進位傳給MATLAB
+
+ZMQ_STATE_SNDHWM = 2  # 狀態快照發送高水位: 慢速訂閱者只保留最新幾幀，舊快照直接丟棄
+ZMQ_MISSION_SNDHWM = 1000  # 任務通道高水位 (任務不可丟棄，需足夠緩衝)
+GPU_MIN_DRONES = 32  # 少於此數量時GPU啟動開銷大於收益
+DENSE_MAX_DRONES = 256  # 無SciPy/CuPy時，稠密 N x N 距離計算的數量上限
+MAVLINK_MAX_SYSTEMS = 256  # MAVLink系統ID範圍 (uint8)
+
+# MAVLink待更新標記位
+MAV_POS_BIT = 0x1
+MAV_ATT_BIT = 0x2
+MAV_STATUS_BIT = 0x4
+MAV_KINEMATIC_BITS = MAV_POS_BIT | MAV_ATT_BIT
+MAVLINK_FUSE_TIMEOUT = 0.25  # 位置/姿態未齊全時最長等待時間 (秒)
+MAVLINK_WRITE_CHUNK = 1400  # 批次發送時單次寫入上限 (低於UDP路徑MTU)
+
+# MATLAB端base64解碼: 還原為 N x 10 double矩陣
+_MATLAB_DECODE_STATE_BUFFER = (
+    "ds_buf = reshape(typecast(matlab.net.base64decode(ds_b64), 'double'), "
+    f"{STATE_BUFFER_COLUMNS}, []).';"
+)
+
+# 任務航點共享記憶體環: 寫入計數 (head) 與已讀計數 (tail) 各8位元組，之後為固定格式的緊湊記錄
+MISSION_RING_SLOTS = 4096
+MISSION_RING_HEADER = 16
+MISSION_RING_DTYPE = np.dtype([
+    ('drone_id', '<u4'), ('seq', '<u4'), ('lat', '<f8'),
+    ('lon', '<f8'), ('alt', '<f4'), ('cmd', '<u2')
+])
+
+# MATLAB端以memmapfile映射環形緩衝區 (欄位順序與MISSION_RING_DTYPE一致)
+_MATLAB_MAP_MISSION_RING = (
+    f"mission_ring = memmapfile(mission_ring_path, 'Offset', {MISSION_RING_HEADER}, 'Format', "
+    "{'uint32', [1 1], 'drone_id'; 'uint32', [1 1], 'seq'; 'double', [1 1], 'lat'; "
+    "'double', [1 1], 'lon'; 'single', [1 1], 'alt'; 'uint16', [1 1], 'cmd'}, "
+    f"'Repeat', {MISSION_RING_SLOTS});"
+)
+
+# MATLAB端從環形緩衝區讀出 [wp_start, wp_start + wp_count) 並拼為 N x 5 矩陣
+_MATLAB_READ_MISSION_RING = (
+    f"wp_rec = mission_ring.Data(mod(wp_start + (0:wp_count-1), {MISSION_RING_SLOTS}) + 1); "
+    "update_mission_from_python(wp_drone_id, [double([wp_rec.seq]'), [wp_rec.lat]', "
+    "[wp_rec.lon]', double([wp_rec.alt]'), double([wp_rec.cmd]')]);"
+)
+
+class DroneTable:
+    """無人機狀態表 - 以SoA連續陣列存儲所有無人機狀態"""
+    
+    _ARRAY_FIELDS = ('timestamps', 'positions', 'velocities', 'attitudes',
+                     'battery_voltage', 'armed', 'gps_fix', 'geodetic', 'has_position')
+    
+    def __init__(self, capacity: int = MAX_DRONES):
+        self.capacity = capacity
+        self.ids: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.flight_modes: List[str] = []
+        self.version = 0  # 每次寫入後遞增，供下游判斷是否有新數據
+        
+        # 預分配連續陣列 (列號與ids對應)
+        self.timestamps = np.zeros(capacity)
+        self.positions = np.zeros((capacity, 3))
+        self.velocities = np.zeros((capacity, 3))
+        self.attitudes = np.zeros((capacity, 3))  # roll, pitch, yaw
+        self.battery_voltage = np.zeros(capacity)
+        self.armed = np.zeros(capacity, dtype=bool)
+        self.gps_fix = np.zeros(capacity, dtype=np.int32)
+        self.geodetic = np.zeros(capacity, dtype=bool)  # 位置為 (緯度, 經度, 高度m) 而非本地米制座標
+        self.has_position = np.zeros(capacity, dtype=bool)  # 是否已收到過位置 (否則positions為預設的原點)
+        
+        # MATLAB傳輸用的打包緩衝區 (重複使用)
+        self._state_buffer = np.empty((capacity, STATE_BUFFER_COLUMNS))
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def __contains__(self, drone_id: str) -> bool:
+        return drone_id in self.id_to_row
+    
+    def row(self, drone_id: str) -> int:
+        """獲取無人機所在列號，不存在時新增"""
+        row = self.id_to_row.get(drone_id)
+        if row is None:
+            row = len(self.ids)
+            if row >= self.capacity:
+                self._grow()
+            self.ids.append(drone_id)
+            self.flight_modes.append("UNKNOWN")
+            self.id_to_row[drone_id] = row
+            self.version += 1
+        return row
+    
+    def _grow(self):
+        """容量加倍並保留既有數據"""
+        new_capacity = self.capacity * 2
+        for name in self._ARRAY_FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = new_capacity
+    
+    def pack_state_buffer(self) -> np.ndarray:
+        """將狀態打包為連續的 (N, 10) float64緩衝區 [position, velocity, attitude, timestamp]"""
+        n = len(self.ids)
+        if self._state_buffer.shape[0] < self.capacity:
+            self._state_buffer = np.empty((self.capacity, STATE_BUFFER_COLUMNS))
+        
+        buf = self._state_buffer[:n]
+        buf[:, 0:3] = self.positions[:n]
+        buf[:, 3:6] = self.velocities[:n]
+        buf[:, 6:9] = self.attitudes[:n]
+        buf[:, 9] = self.timestamps[:n]
+        return buf
+    
+    def get_state(self, drone_id: str) -> DroneState:
+        """以DroneState形式返回單架無人機的狀態副本"""
+        return self._state_at(self.id_to_row[drone_id])
+    
+    def items(self):
+        """迭代 (drone_id, DroneState) 副本"""
+        for row, drone_id in enumerate(self.ids):
+            yield drone_id, self._state_at(row)
+    
+    def _state_at(self, row: int) -> DroneState:
+        return DroneState(
+            drone_id=self.ids[row],
+            timestamp=float(self.timestamps[row]),
+            position=self.positions[row].copy(),
+            velocity=self.velocities[row].copy(),
+            attitude=self.attitudes[row].copy(),
+            battery_voltage=float(self.battery_voltage[row]),
+            flight_mode=self.flight_modes[row],
+            armed=bool(self.armed[row]),
+            gps_fix=int(self.gps_fix[row])
+        )
+
+class MissionRing:
+    """任務航點共享記憶體環形緩衝區 - MATLAB端以memmapfile直接讀取，無需序列化"""
+    
+    def __init__(self, slots: int = MISSION_RING_SLOTS):
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=MISSION_RING_HEADER + slots * MISSION_RING_DTYPE.itemsize
+        )
+        # memmapfile需要檔案路徑，僅支援以/dev/shm公開共享記憶體的平台
+        self.path = f"/dev/shm/{self.shm.name.lstrip('/')}"
+        if not os.path.exists(self.path):
+            self.close()
+            raise OSError(f"共享記憶體無檔案路徑: {self.shm.name}")
+        
+        self._counters = np.ndarray((2,), dtype='<u8', buffer=self.shm.buf)  # [head, tail]
+        self.records = np.ndarray((slots,), dtype=MISSION_RING_DTYPE,
+                                  buffer=self.shm.buf, offset=MISSION_RING_HEADER)
+        self._counters[:] = 0
+        self.drone_index: Dict[str, int] = {}  # 無人機ID -> 記錄中的drone_id編號
+    
+    def write(self, drone_id: str, columns: Dict[str, np.ndarray]) -> Optional[Tuple[int, int]]:
+        """寫入一組航點欄位，返回 (起始計數, 筆數)；全部寫入後才推進head
+        
+        剩餘空間不足 (會覆蓋尚未讀取的記錄) 時不寫入並返回None
+        """
+        count = len(columns['seq'])
+        start, tail = int(self._counters[0]), int(self._counters[1])
+        if start + count - tail > self.slots:
+            return None
+        
+        index = self.drone_index.setdefault(drone_id, len(self.drone_index))
+        slots = (start + np.arange(count)) % self.slots
+        
+        records = self.records
+        records['drone_id'][slots] = index
+        records['seq'][slots] = columns['seq']
+        records['lat'][slots] = columns['lat']
+        records['lon'][slots] = columns['lon']
+        records['alt'][slots] = columns['alt']
+        records['cmd'][slots] = columns['command']
+        
+        self._counters[0] = start + count
+        return start, count
+    
+    @property
+    def head(self) -> int:
+        """已寫入的記錄總數"""
+        return int(self._counters[0])
+    
+    def release(self, end: int):
+        """標記計數end之前的記錄已讀取 (僅由MATLAB線程調用)"""
+        if end > self._counters[1]:
+            self._counters[1] = end
+    
+    def close(self):
+        """釋放並刪除共享記憶體"""
+        # 先釋放numpy視圖，否則SharedMemory.close會因緩衝區仍被引用而失敗
+        self._counters = None
+        self.records = None
+        self.shm.close()
+        self.shm.unlink()
+
+EARTH_RADIUS = 6378137.0  # WGS84赤道半徑 (米)
+
+def geodetic_to_enu(positions: np.ndarray) -> np.ndarray:
+    """將 (緯度, 經度, 高度m) 轉為以其平均位置為原點的本地ENU米制座標 (等距柱狀近似，適用於機群範圍)"""
+    lat0, lon0 = positions[:, 0].mean(), positions[:, 1].mean()
+    enu = np.empty_like(positions)
+    enu[:, 0] = np.radians(positions[:, 1] - lon0) * EARTH_RADIUS * np.cos(np.radians(lat0))
+    enu[:, 1] = np.radians(positions[:, 0] - lat0) * EARTH_RADIUS
+    enu[:, 2] = positions[:, 2]
+    return enu
+
+class SafetyDistanceChecker:
+    """安全距離檢查器 - 計算每架無人機與最近鄰機的距離 (CuPy可用時使用GPU)"""
+    
+    def __init__(self, safety_distance: float = 5.0):
+        self.safety_distance = safety_distance
+        self._gpu_positions = None  # 常駐GPU的位置緩衝區，跨週期重複使用
+        self._dense_limit_warned = False
+    
+    def min_distances(self, positions: np.ndarray) -> np.ndarray:
+        """返回每架無人機到最近其他無人機的距離 (positions為 N x 3)"""
+        n = len(positions)
+        if n < 2:
+            return np.full(n, np.inf)
+        
+        if CUPY_AVAILABLE and n >= GPU_MIN_DRONES:
+            return self._min_distances_gpu(positions)
+        return self._min_distances_cpu(positions)
+    
+    def find_conflicts(self, positions: np.ndarray) -> np.ndarray:
+        """返回距離小於安全距離的布林遮罩"""
+        return self.min_distances(positions) < self.safety_distance
+    
+    def _min_distances_cpu(self, positions: np.ndarray) -> np.ndarray:
+        if SCIPY_AVAILABLE:
+            # KD樹最近鄰查詢 O(N log N): k=2 的第二個結果即最近的其他無人機
+            distances, _ = cKDTree(positions).query(positions, k=2)
+            return distances[:, 1]
+        
+        n = len(positions)
+        if n > DENSE_MAX_DRONES:
+            if not self._dense_limit_warned:
+                logger.warning(f"無SciPy/CuPy且無人機數超過{DENSE_MAX_DRONES}，略過安全距離檢查")
+                self._dense_limit_warned = True
+            return np.full(n, np.inf)
+        
+        diff = positions[:, None, :] - positions[None, :, :]
+        distances = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+        np.fill_diagonal(distances, np.inf)
+        return distances.min(axis=1)
+    
+    def _min_distances_gpu(self, positions: np.ndarray) -> np.ndarray:
+        n = len(positions)
+        if self._gpu_positions is None or self._gpu_positions.shape[0] < n:
+            self._gpu_positions = cp.empty((max(n, MAX_DRONES), 3))
+        
+        # 只傳輸有效列到既有的GPU緩衝區
+        gpu_positions = self._gpu_positions[:n]
+        gpu_positions.set(np.ascontiguousarray(positions, dtype=np.float64))
+        
+        distances = cp.linalg.norm(gpu_positions[:, None, :] - gpu_positions[None, :, :], axis=-1)
+        cp.fill_diagonal(distances, cp.inf)
+        return cp.asnumpy(distances.min(axis=1))
+
 class MATLABBridge:
-    """MATLAB引擎橋接器"""
+    """MATLAB引擎橋接器 (非線程安全，所有調用應由同一個工作線程執行)"""
     
     def __init__(self, matlab_path: Optional[str] = None):
         self.engine = None
         self.matlab_path = matlab_path
         self.is_connected = False
-        self._lock = threading.Lock()
         
     def connect(self) -> bool:
         """連接到MATLAB引擎"""
@@ -130,25 +570,34 @@ class MATLABBridge:
         if not self.is_connected:
             raise Exception("MATLAB引擎未連接")
         
-        with self._lock:
-            try:
-                matlab_func = getattr(self.engine, func_name)
-                return matlab_func(*args, **kwargs)
-            except Exception as e:
-                logger.error(f"MATLAB函數調用失敗 {func_name}: {e}")
-                raise
+        try:
+            matlab_func = getattr(self.engine, func_name)
+            return matlab_func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"MATLAB函數調用失敗 {func_name}: {e}")
+            raise
     
-    def evaluate(self, expression: str) -> Any:
+    def evaluate(self, expression: str, nargout: int = 1) -> Any:
         """執行MATLAB表達式"""
         if not self.is_connected:
             raise Exception("MATLAB引擎未連接")
         
-        with self._lock:
-            try:
-                return self.engine.eval(expression)
-            except Exception as e:
-                logger.error(f"MATLAB表達式執行失敗: {e}")
-                raise
+        try:
+            return self.engine.eval(expression, nargout=nargout)
+        except Exception as e:
+            logger.error(f"MATLAB表達式執行失敗: {e}")
+            raise
+    
+    def set_variable(self, name: str, value: Any):
+        """設置MATLAB工作區變數"""
+        if not self.is_connected:
+            raise Exception("MATLAB引擎未連接")
+        
+        try:
+            self.engine.workspace[name] = value
+        except Exception as e:
+            logger.error(f"MATLAB變數設置失敗 {name}: {e}")
+            raise
 
 class MAVLinkInterface:
     """MAVLink協議接口"""
@@ -158,8 +607,11 @@ class MAVLinkInterface:
         self.connection = None
         self.is_connected = False
         self.message_handlers: Dict[str, List[Callable]] = {}
+        self.handler_table: List[List[Callable]] = [[] for _ in range(256)]  # 依數字msgid索引
         self.running = False
         self._thread = None
+        self.bad_data_count = 0
+        self._preamble_cache: Dict[Tuple[int, int, int], Tuple[Any, Any]] = {}
         
         if not MAVLINK_AVAILABLE:
             logger.warning("MAVLink不可用，接口將無法工作")
@@ -171,7 +623,9 @@ class MAVLinkInterface:
         
         try:
             logger.info(f"🔗 正在連接MAVLink: {self.connection_string}")
-            self.connection = mavutil.mavlink_connection(self.connection_string)
+            # robust_parsing: 損壞數據返回BAD_DATA而非拋出異常中斷接收
+            self.connection = mavutil.mavlink_connection(self.connection_string, robust_parsing=True)
+            self._preamble_cache.clear()
             
             # 等待心跳包
             logger.info("等待心跳包...")
@@ -211,6 +665,13 @@ class MAVLinkInterface:
         if message_type not in self.message_handlers:
             self.message_handlers[message_type] = []
         self.message_handlers[message_type].append(handler)
+        
+        # 消息名稱只在註冊時解析為msgid，分派時直接按索引查表
+        if MAVLINK_AVAILABLE:
+            msg_id = getattr(mavlink, f"MAVLINK_MSG_ID_{message_type}")
+            if msg_id >= len(self.handler_table):
+                self.handler_table.extend([] for _ in range(msg_id + 1 - len(self.handler_table)))
+            self.handler_table[msg_id].append(handler)
     
     def send_waypoint_mission(self, waypoints: List[MissionWaypoint], target_system: int = 1, target_component: int = 1):
         """發送航點任務"""
@@ -218,15 +679,13 @@ class MAVLinkInterface:
             return False
         
         try:
-            # 清除現有任務
-            self.connection.mav.mission_clear_all_send(target_system, target_component)
-            
-            # 發送任務計數
-            self.connection.mav.mission_count_send(target_system, target_component, len(waypoints))
+            # 清除現有任務並發送任務計數 (使用快取的已編碼消息)
+            mav = self.connection.mav
+            msgs = list(self._mission_preamble(target_system, target_component, len(waypoints)))
             
-            # 發送每個航點
-            for i, wp in enumerate(waypoints):
-                self.connection.mav.mission_item_send(
+            # 編碼每個航點
+            for wp in waypoints:
+                msgs.append(mav.mission_item_encode(
                     target_system,
                     target_component,
                     wp.sequence,
@@ -236,7 +695,9 @@ class MAVLinkInterface:
                     wp.autocontinue,
                     wp.param1, wp.param2, wp.param3, wp.param4,
                     wp.lat, wp.lon, wp.alt
-                )
+                ))
+            
+            self.send_waypoint_mission_bulk(msgs)
             
             logger.info(f"✅ 已發送{len(waypoints)}個航點任務")
             return True
@@ -245,6 +706,46 @@ class MAVLinkInterface:
             logger.error(f"❌ 發送航點任務失敗: {e}")
             return False
     
+    def send_waypoint_mission_bulk(self, msgs: List[Any]):
+        """將多個消息打包進同一緩衝區，按MTU分段批次寫入 (取代逐條mav.send)
+        
+        序號與CRC仍由pymavlink的pack計算，此處只負責遞增序號與合併寫入
+        """
+        mav = self.connection.mav
+        buf = bytearray()
+        total = 0
+        
+        for msg in msgs:
+            frame = msg.pack(mav)
+            mav.seq = (mav.seq + 1) % 256
+            if len(buf) + len(frame) > MAVLINK_WRITE_CHUNK:
+                mav.file.write(buf)
+                buf = bytearray()
+            buf += frame
+            total += len(frame)
+        
+        if buf:
+            mav.file.write(buf)
+        
+        mav.total_packets_sent += len(msgs)
+        mav.total_bytes_sent += total
+    
+    def _mission_preamble(self, target_system: int, target_component: int, count: int) -> Tuple[Any, Any]:
+        """獲取 (MISSION_CLEAR_ALL, MISSION_COUNT) 消息物件，依目標與航點數快取
+        
+        快取的是消息物件而非位元組: 序號與CRC每次發送時由send_waypoint_mission_bulk中的msg.pack(mav)重新計算
+        """
+        key = (target_system, target_component, count)
+        preamble = self._preamble_cache.get(key)
+        if preamble is None:
+            mav = self.connection.mav
+            preamble = (
+                mav.mission_clear_all_encode(target_system, target_component),
+                mav.mission_count_encode(target_system, target_component, count)
+            )
+            self._preamble_cache[key] = preamble
+        return preamble
+    
     def request_drone_state(self, target_system: int = 1):
         """請求無人機狀態"""
         if not self.is_connected or not MAVLINK_AVAILABLE:
@@ -265,33 +766,82 @@ class MAVLinkInterface:
     
     def _message_loop(self):
         """消息處理循環"""
+        if isinstance(self.connection, mavutil.mavudp):
+            self._datagram_loop()
+            return
+        
         while self.running and self.connection:
             try:
                 msg = self.connection.recv_match(timeout=1.0)
                 if msg:
-                    msg_type = msg.get_type()
+                    self._dispatch(msg)
+                
+            except Exception as e:
+                logger.error(f"消息接收錯誤: {e}")
+                break
+    
+    def _datagram_loop(self):
+        """UDP消息處理循環 - 整包讀取後一次解析所有消息"""
+        connection = self.connection
+        
+        while self.running and connection:
+            try:
+                if not connection.select(1.0):
+                    continue
+                
+                data = connection.recv()
+                if not data:
+                    continue
+                
+                msgs = connection.mav.parse_buffer(data)
+                if not msgs:
+                    continue
+                
+                for msg in msgs:
+                    if msg.get_msgId() == mavlink.MAVLINK_MSG_ID_BAD_DATA:
+                        self.bad_data_count += 1
+                        continue
                     
-                    # 調用註冊的處理器
-                    if msg_type in self.message_handlers:
-                        for handler in self.message_handlers[msg_type]:
-                            try:
-                                handler(msg)
-                            except Exception as e:
-                                logger.error(f"消息處理器錯誤: {e}")
+                    # 保持mavutil連接狀態 (與recv_match行為一致)
+                    connection.post_message(msg)
+                    self._dispatch(msg)
                 
             except Exception as e:
                 logger.error(f"消息接收錯誤: {e}")
                 break
+    
+    def _dispatch(self, msg):
+        """調用註冊的處理器"""
+        msg_id = msg.get_msgId()
+        if 0 <= msg_id < len(self.handler_table):
+            for handler in self.handler_table[msg_id]:
+                try:
+                    handler(msg)
+                except Exception as e:
+                    logger.error(f"消息處理器錯誤: {e}")
+
+# ROS2 QoS預設: 高頻遙測盡力傳輸不重傳，任務數據可靠且保留給晚加入的訂閱者
+DEFAULT_ROS2_QOS = {
+    'telemetry': {'reliability': 'best_effort', 'durability': 'volatile', 'depth': 5},
+    'mission': {'reliability': 'reliable', 'durability': 'transient_local', 'depth': 10},
+}
 
 class ROS2Bridge:
     """ROS2橋接器"""
     
-    def __init__(self, node_name: str = "drone_sim_bridge"):
+    def __init__(self, node_name: str = "drone_sim_bridge", qos_config: Optional[Dict[str, Dict]] = None):
         self.node_name = node_name
+        self.qos_config = {
+            name: {**defaults, **(qos_config or {}).get(name, {})}
+            for name, defaults in DEFAULT_ROS2_QOS.items()
+        }
+        self.telemetry_qos = None
+        self.mission_qos = None
         self.node = None
         self.is_initialized = False
         self.publishers = {}
         self.subscribers = {}
+        self._path_cache: Dict[str, Tuple[Any, List[Any]]] = {}  # topic -> (Path消息, PoseStamped池)
         self.running = False
         self._executor = None
         self._thread = None
@@ -309,6 +859,8 @@ class ROS2Bridge:
             
             rclpy.init()
             self.node = Node(self.node_name)
+            self.telemetry_qos = self._make_qos(self.qos_config['telemetry'])
+            self.mission_qos = self._make_qos(self.qos_config['mission'])
             self.is_initialized = True
             
             # 創建執行器
@@ -342,30 +894,79 @@ class ROS2Bridge:
         
         logger.info("🔌 ROS2節點已關閉")
     
-    def create_publisher(self, topic: str, msg_type, qos_depth: int = 10):
-        """創建發布者"""
+    @staticmethod
+    def _make_qos(settings: Dict[str, Any]) -> 'QoSProfile':
+        """由配置字典建立QoSProfile"""
+        return QoSProfile(
+            reliability=ReliabilityPolicy[settings['reliability'].upper()],
+            durability=DurabilityPolicy[settings['durability'].upper()],
+            depth=settings['depth']
+        )
+    
+    def create_publisher(self, topic: str, msg_type, qos_profile: Union[int, 'QoSProfile'] = 10):
+        """創建發布者 (qos_profile可為佇列深度或QoSProfile)"""
         if not self.is_initialized:
             return None
         
-        publisher = self.node.create_publisher(msg_type, topic, qos_depth)
+        publisher = self.node.create_publisher(msg_type, topic, qos_profile)
         self.publishers[topic] = publisher
         logger.info(f"📡 創建發布者: {topic}")
         return publisher
     
-    def create_subscriber(self, topic: str, msg_type, callback, qos_depth: int = 10):
+    def create_subscriber(self, topic: str, msg_type, callback, qos_profile: Union[int, 'QoSProfile'] = 10):
         """創建訂閱者"""
         if not self.is_initialized:
             return None
         
-        subscriber = self.node.create_subscription(msg_type, topic, callback, qos_depth)
+        subscriber = self.node.create_subscription(msg_type, topic, callback, qos_profile)
         self.subscribers[topic] = subscriber
         logger.info(f"📡 創建訂閱者: {topic}")
         return subscriber
     
     def publish_drone_path(self, topic: str, waypoints: List[Tuple[float, float, float]]):
-        """發布無人機路徑"""
+        """發布無人機路徑 (高頻遙測，使用盡力傳輸QoS)"""
         if topic not in self.publishers:
-            self.create_publisher(topic, Path)
+            self.create_publisher(topic, Path, self.telemetry_qos)
+        
+        # 沒有訂閱者時不構建消息
+        if self.publishers[topic].get_subscription_count() == 0:
+            return
+        
+        # 每個主題重複使用同一個Path消息與PoseStamped池，只更新時間戳與座標
+        cached = self._path_cache.get(topic)
+        if cached is None:
+            path_msg = Path()
+            path_msg.header = Header()
+            path_msg.header.frame_id = "map"
+            cached = self._path_cache[topic] = (path_msg, [])
+        path_msg, pose_pool = cached
+        
+        while len(pose_pool) < len(waypoints):
+            pose_stamped = PoseStamped()
+            pose_stamped.header = path_msg.header
+            pose_stamped.pose.orientation = Quaternion(w=1.0)
+            pose_pool.append(pose_stamped)
+        
+        path_msg.header.stamp = self.node.get_clock().now().to_msg()
+        
+        for pose_stamped, (x, y, z) in zip(pose_pool, waypoints):
+            position = pose_stamped.pose.position
+            position.x = x
+            position.y = y
+            position.z = z
+        
+        if len(path_msg.poses) != len(waypoints):
+            path_msg.poses = pose_pool[:len(waypoints)]
+        
+        self.publishers[topic].publish(path_msg)
+    
+    def publish_mission_path(self, topic: str, waypoints: List[Tuple[float, float, float]]):
+        """發布任務航點 (可靠且transient local，晚加入的訂閱者仍可收到最新任務)"""
+        if not self.is_initialized:
+            return
+        
+        if topic not in self.publishers:
+            self.create_publisher(topic, Path, self.mission_qos)
         
         path_msg = Path()
         path_msg.header = Header()
@@ -399,35 +1000,49 @@ class WebSocketServer:
         self.clients = set()
         self.running = False
         self.server = None
+        self.on_clients_changed: Optional[Callable[[int], None]] = None  # 客戶端數量變化回調
         
     async def register(self, websocket, path):
         """註冊客戶端"""
         self.clients.add(websocket)
+        self._notify_clients_changed()
         logger.info(f"📱 客戶端已連接: {websocket.remote_address}")
         
         try:
             await websocket.wait_closed()
         finally:
-            self.clients.remove(websocket)
+            self.clients.discard(websocket)
+            self._notify_clients_changed()
             logger.info(f"📱 客戶端已斷開: {websocket.remote_address}")
     
-    async def broadcast_data(self, data: Dict):
-        """廣播數據到所有客戶端"""
+    def _notify_clients_changed(self):
+        if self.on_clients_changed:
+            self.on_clients_changed(len(self.clients))
+    
+    async def broadcast_data(self, data: Union[Dict, bytes]):
+        """廣播數據到所有客戶端 (可傳入預先編碼的bytes)"""
         if self.clients:
-            message = json.dumps(data)
-            disconnected = set()
+            # 只編碼一次，所有客戶端共用同一個bytes物件
+            message = data if isinstance(data, bytes) else _dumps(data)
             
-            for client in self.clients:
-                try:
-                    await client.send(message)
-                except websockets.exceptions.ConnectionClosed:
-                    disconnected.add(client)
-                except Exception as e:
-                    logger.error(f"廣播錯誤: {e}")
+            # 並行發送，單一慢速客戶端不會阻塞其他客戶端
+            clients = list(self.clients)
+            results = await asyncio.gather(
+                *(client.send(message) for client in clients),
+                return_exceptions=True
+            )
+            
+            disconnected = set()
+            for client, result in zip(clients, results):
+                if isinstance(result, Exception):
+                    if not isinstance(result, websockets.exceptions.ConnectionClosed):
+                        logger.error(f"廣播錯誤: {result}")
                     disconnected.add(client)
             
             # 清理斷開的連接
-            self.clients -= disconnected
+            if disconnected:
+                self.clients -= disconnected
+                self._notify_clients_changed()
     
     async def start_server(self):
         """啟動WebSocket服務器"""
@@ -450,52 +1065,149 @@ class WebSocketServer:
         logger.info("🔌 WebSocket服務器已停止")
 
 class ZMQCommunicator:
-    """ZeroMQ通信器 - 用於高性能數據傳輸"""
+    """ZeroMQ通信器 - 用於高性能數據傳輸 (基於zmq.asyncio，收發皆為協程)"""
     
     def __init__(self, port: int = 5555):
-        self.context = zmq.Context()
+        self.context = zmq.asyncio.Context()
         self.socket = None
+        self.mission_socket = None  # 任務PUSH/PULL通道 (port + 1)，與狀態發布互不阻塞
         self.port = port
         self.running = False
+        self._subscriptions: Counter = Counter()  # 訂閱前綴 -> 訂閱者數量
         
     def setup_publisher(self):
-        """設置發布者模式"""
-        self.socket = self.context.socket(zmq.PUB)
+        """設置發布者模式 (XPUB: 可得知訂閱者的訂閱/退訂)"""
+        self.socket = self.context.socket(zmq.XPUB)
+        self.socket.setsockopt(zmq.XPUB_VERBOSER, 1)  # 重複訂閱與退訂都上報，以便計數
+        self.socket.setsockopt(zmq.SNDHWM, ZMQ_STATE_SNDHWM)
         self.socket.bind(f"tcp://*:{self.port}")
-        logger.info(f"📡 ZMQ發布者已啟動: tcp://*:{self.port}")
+        
+        # 任務由同步PUSH socket發送，可在非協程的API方法中直接調用
+        self.mission_socket = zmq.Socket(self.context, zmq.PUSH)
+        self.mission_socket.setsockopt(zmq.SNDHWM, ZMQ_MISSION_SNDHWM)
+        self.mission_socket.bind(f"tcp://*:{self.port + 1}")
+        logger.info(f"📡 ZMQ發布者已啟動: tcp://*:{self.port} (任務: tcp://*:{self.port + 1})")
     
-    def setup_subscriber(self, server_address: str = "localhost"):
-        """設置訂閱者模式"""
+    def setup_subscriber(self, server_address: str = "localhost", topics: Optional[List[str]] = None):
+        """設置訂閱者模式 (topics為None時訂閱所有消息)"""
         self.socket = self.context.socket(zmq.SUB)
         self.socket.connect(f"tcp://{server_address}:{self.port}")
-        self.socket.setsockopt(zmq.SUBSCRIBE, b"")  # 訂閱所有消息
+        
+        # 主題前綴在socket層過濾，無需解碼負載
+        for topic in topics or ['']:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic.encode())
         logger.info(f"📡 ZMQ訂閱者已連接: tcp://{server_address}:{self.port}")
     
-    def send_data(self, topic: str, data: Dict):
-        """發送數據"""
-        if self.socket and self.socket.socket_type == zmq.PUB:
-            message = {
-                'topic': topic,
-                'timestamp': time.time(),
-                'data': data
-            }
-            self.socket.send_string(json.dumps(message))
+    def setup_mission_receiver(self, server_address: str = "localhost"):
+        """設置任務接收端 (PULL，連接發布者的port + 1)"""
+        self.mission_socket = self.context.socket(zmq.PULL)
+        self.mission_socket.connect(f"tcp://{server_address}:{self.port + 1}")
+        logger.info(f"📡 ZMQ任務接收端已連接: tcp://{server_address}:{self.port + 1}")
+    
+    @staticmethod
+    def _frame_message(topic: str, data: Dict, arrays: Optional[Dict[str, np.ndarray]]) -> List[Any]:
+        """組成多幀消息: 主題, 負載, 各numpy陣列的原始緩衝區"""
+        message = {
+            'topic': topic,
+            'timestamp': time.time(),
+            'data': data
+        }
+        
+        # 陣列以原始位元組獨立成幀，類型與形狀記錄在負載中
+        buffers = []
+        if arrays:
+            message['arrays'] = []
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                message['arrays'].append([name, array.dtype.str, list(array.shape)])
+                buffers.append(array)
+        return [topic.encode(), _pack(message), *buffers]
+    
+    @staticmethod
+    def _unframe_message(frames: List[Any]) -> Dict:
+        message = _unpack(frames[1].bytes)
+        
+        # 陣列幀以np.frombuffer零拷貝還原
+        for (name, dtype, shape), frame in zip(message.pop('arrays', ()), frames[2:]):
+            message['data'][name] = np.frombuffer(frame.buffer, dtype=dtype).reshape(shape)
+        return message
+    
+    async def send_data(self, topic: str, data: Dict, arrays: Optional[Dict[str, np.ndarray]] = None):
+        """發送數據 (幀: 主題, 負載, 各numpy陣列的原始緩衝區)"""
+        if self.socket and self.socket.socket_type == zmq.XPUB:
+            try:
+                await self.socket.send_multipart(self._frame_message(topic, data, arrays), flags=zmq.NOBLOCK)
+            except zmq.Again:
+                logger.debug(f"ZMQ發送隊列已滿，丟棄消息: {topic}")
     
-    def receive_data(self, timeout: int = 1000):
+    def send_mission(self, drone_id: str, columns: Dict[str, np.ndarray]) -> bool:
+        """經任務PUSH通道發送航點欄位陣列 (未連接接收端或隊列已滿時返回False)"""
+        if not self.mission_socket or self.mission_socket.socket_type != zmq.PUSH:
+            return False
+        
+        try:
+            self.mission_socket.send_multipart(
+                self._frame_message('mission', {'drone_id': drone_id}, columns), flags=zmq.NOBLOCK
+            )
+            return True
+        except zmq.Again:
+            logger.debug(f"ZMQ任務通道無接收端或已滿，任務未發送: {drone_id}")
+            return False
+    
+    async def update_subscriptions(self):
+        """讀取XPUB上報的訂閱/退訂消息並更新計數"""
+        if not self.socket or self.socket.socket_type != zmq.XPUB:
+            return
+        
+        while True:
+            try:
+                event = await self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            
+            if not event:
+                continue
+            prefix = event[1:]
+            if event[0] == 1:
+                self._subscriptions[prefix] += 1
+            elif event[0] == 0:
+                self._subscriptions[prefix] -= 1
+                if self._subscriptions[prefix] <= 0:
+                    del self._subscriptions[prefix]
+    
+    def has_subscribers(self, topic: str) -> bool:
+        """是否有訂閱者的前綴匹配此主題"""
+        topic_bytes = topic.encode()
+        return any(topic_bytes.startswith(prefix) for prefix in self._subscriptions)
+    
+    async def receive_data(self, timeout: int = 1000):
         """接收數據"""
         if self.socket and self.socket.socket_type == zmq.SUB:
             try:
-                if self.socket.poll(timeout):
-                    message = self.socket.recv_string()
-                    return json.loads(message)
+                if await self.socket.poll(timeout):
+                    frames = await self.socket.recv_multipart(copy=False)
+                    return self._unframe_message(frames)
             except zmq.Again:
                 pass  # 超時
             except Exception as e:
                 logger.error(f"ZMQ接收錯誤: {e}")
         return None
     
+    async def receive_mission(self, timeout: int = 1000) -> Optional[Dict]:
+        """接收任務 (data含drone_id與 seq/lat/lon/alt/command 欄位陣列)"""
+        if self.mission_socket and self.mission_socket.socket_type == zmq.PULL:
+            try:
+                if await self.mission_socket.poll(timeout):
+                    frames = await self.mission_socket.recv_multipart(copy=False)
+                    return self._unframe_message(frames)
+            except Exception as e:
+                logger.error(f"ZMQ任務接收錯誤: {e}")
+        return None
+    
     def close(self):
         """關閉通信器"""
+        if self.mission_socket:
+            self.mission_socket.close(linger=0)
         if self.socket:
             self.socket.close()
         self.context.term()
@@ -510,30 +1222,113 @@ class DroneSimulationBridge:
         # 組件初始化
         self.matlab_bridge = MATLABBridge(self.config.get('matlab_path'))
         self.mavlink_interface = MAVLinkInterface(self.config.get('mavlink_connection', 'udp:localhost:14550'))
-        self.ros2_bridge = ROS2Bridge(self.config.get('ros2_node_name', 'drone_sim_bridge'))
+        self.ros2_bridge = ROS2Bridge(
+            self.config.get('ros2_node_name', 'drone_sim_bridge'),
+            self.config.get('ros2_qos')
+        )
         self.websocket_server = WebSocketServer(
             self.config.get('websocket_host', 'localhost'),
             self.config.get('websocket_port', 8765)
         )
         self.zmq_communicator = ZMQCommunicator(self.config.get('zmq_port', 5555))
         
+        # WebSocket線路格式: 預設msgpack (IEEE754二進位浮點)，'json' 便於除錯
+        self._ws_encode = _dumps if self.config.get('wire_format', 'msgpack') == 'json' else _pack
+        self.safety_checker = SafetyDistanceChecker(self.config.get('safety_distance', 5.0))
+        
         # 數據存儲
-        self.drone_states: Dict[str, DroneState] = {}
-        self.mission_waypoints: Dict[str, List[MissionWaypoint]] = {}
+        self.drone_states = DroneTable()
+        self.safety_conflicts: List[str] = []
+        self._matlab_data: Dict[str, Any] = {}  # 上一輪取得的MATLAB模擬數據
+        self._matlab_state_version = -1  # 上次推送到MATLAB時的狀態表版本
+        
+        # get_drone_states快照 (狀態表版本未變時重複返回同一字典)
+        self._states_snapshot: Dict[str, DroneState] = {}
+        self._states_snapshot_version = -1
+        self._states_lock = threading.Lock()
+        self.mission_waypoints: Dict[str, np.ndarray] = {}  # drone_id -> WP_DTYPE結構化陣列
+        # (通道, drone_id) -> 該通道已成功送達的任務內容雜湊，用於略過重複上傳
+        self._mission_delivered: Dict[Tuple[str, str], int] = {}
+        self.mission_ring: Optional[MissionRing] = None  # 不可用時退回隊列傳送欄位陣列
+        self._matlab_ring_mapped = False  # 僅在MATLAB線程讀寫
+        
+        # MAVLink最新數據 (依srcSystem索引，處理器直接寫入，主循環批次套用)
+        self._mav_pos = np.zeros((MAVLINK_MAX_SYSTEMS, 6))  # lat, lon, alt, vx, vy, vz
+        self._mav_att = np.zeros((MAVLINK_MAX_SYSTEMS, 3))  # roll, pitch, yaw
+        self._mav_status = np.zeros((MAVLINK_MAX_SYSTEMS, 2))  # battery_voltage, armed
+        self._mav_dirty = np.zeros(MAVLINK_MAX_SYSTEMS, dtype=np.uint8)
+        self._mav_pending_since = np.zeros(MAVLINK_MAX_SYSTEMS)  # 未齊全樣本的首次等待時間
+        self._mav_rows = np.full(MAVLINK_MAX_SYSTEMS, -1, dtype=np.intp)  # srcSystem -> 狀態表列號
+        
+        # 無人機ID與MAVLink系統ID雙向快取 (ID字串已intern)
+        self._sys_to_id: Dict[int, str] = {}
+        self._id_to_sys: Dict[str, int] = {}
+        
+        # 線程池: MATLAB引擎調用全部經由單一專用線程，其他阻塞I/O使用小型線程池
+        self.matlab_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='matlab', initializer=self._init_matlab_thread
+        )
+        self.thread_pool = ThreadPoolExecutor(max_workers=2)
+        
+        # 數據處理隊列 (deque的append/popleft為原子操作，無需加鎖；滿時丟棄最舊項目)
+        self.data_queue: deque = deque(maxlen=1000)
         
-        # 線程池
-        self.thread_pool = ThreadPoolExecutor(max_workers=4)
-        self.process_pool = ProcessPoolExecutor(max_workers=2) if CUPY_AVAILABLE else None
+        # 待送往MATLAB的任務 (每架無人機只保留最新一份，重複上傳時覆蓋)
+        self._pending_missions: Dict[str, Dict] = {}
+        self._missions_lock = threading.Lock()  # API調用方可能在任意線程寫入
         
-        # 數據處理隊列
-        self.data_queue = queue.Queue(maxsize=1000)
+        # 數據項目類型 -> (處理方法, 是否需在MATLAB線程執行)，單次查表分派
+        self._handlers: Dict[str, Tuple[Callable[[Any], None], bool]] = {
+            'drone_state': (self._update_drone_state, False),
+            'mission_waypoint': (self._update_mission_waypoints, True),
+            'matlab_command': (self._execute_matlab_command, True)
+        }
         
         # 運行狀態
         self.running = False
         self.update_interval = 0.1  # 10Hz更新頻率
+        self.overrun_count = 0
+        
+        # 統計信息快取 (僅在連接狀態變化時更新)
+        self._stats: Dict[str, Any] = {
+            'connected_drones': 0,
+            'matlab_connected': False,
+            'mavlink_connected': False,
+            'ros2_initialized': False,
+            'websocket_clients': 0,
+            'running': False
+        }
+        self.websocket_server.on_clients_changed = self._on_websocket_clients_changed
         
         logger.info("🌉 無人機模擬橋接器已初始化")
     
+    def _init_matlab_thread(self):
+        """MATLAB專用線程啟動時設定CPU親和性與優先級 (配置 matlab_cpus / matlab_nice，平台不支援時略過)"""
+        cpus = self.config.get('matlab_cpus')
+        if cpus is not None and hasattr(os, 'sched_setaffinity'):
+            try:
+                # pid 0 代表調用線程本身，不影響事件循環線程
+                os.sched_setaffinity(0, set(cpus))
+            except OSError as e:
+                logger.warning(f"MATLAB線程CPU親和性設定失敗: {e}")
+        
+        nice = self.config.get('matlab_nice')
+        if nice is not None and hasattr(os, 'nice'):
+            try:
+                # Linux上nice值為線程級別
+                os.nice(nice)
+            except OSError as e:
+                logger.warning(f"MATLAB線程優先級設定失敗: {e}")
+    
+    @staticmethod
+    def install_fast_loop() -> bool:
+        """設置uvloop事件循環策略，需在創建事件循環前調用 (uvloop不可用時返回False)"""
+        if not UVLOOP_AVAILABLE:
+            return False
+        
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return True
+    
     async def start(self):
         """啟動橋接器"""
         logger.info("🚀 啟動無人機模擬橋接器...")
@@ -558,13 +1353,24 @@ class DroneSimulationBridge:
                 logger.warning("ROS2初始化失敗")
             else:
                 # 創建ROS2發布者和訂閱者
-                self.ros2_bridge.create_publisher('/drone_sim/paths', Path)
+                self.ros2_bridge.create_publisher('/drone_sim/paths', Path, self.ros2_bridge.telemetry_qos)
                 self.ros2_bridge.create_subscriber('/drone_sim/commands', String, self._handle_ros2_command)
         
         # 設置ZMQ通信
         self.zmq_communicator.setup_publisher()
         
+        # 建立任務航點共享記憶體環
+        try:
+            self.mission_ring = MissionRing()
+            logger.info(f"🧠 任務共享記憶體環: {self.mission_ring.path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"共享記憶體不可用，任務改經隊列傳送: {e}")
+        
         self.running = True
+        self._refresh_connection_stats()
+        
+        # 重新連接後各通道需重新接收任務
+        self._mission_delivered.clear()
         
         # 啟動主要處理循環和WebSocket服務器
         await asyncio.gather(
@@ -578,98 +1384,300 @@ class DroneSimulationBridge:
         
         self.running = False
         
+        # 等待進行中的MATLAB調用完成後再斷開引擎
+        self.matlab_executor.shutdown(wait=True)
+        
         # 關閉各組件
         self.matlab_bridge.disconnect()
         self.mavlink_interface.disconnect()
         self.ros2_bridge.shutdown()
         self.websocket_server.stop_server()
         self.zmq_communicator.close()
+        self._refresh_connection_stats()
+        
+        if self.mission_ring:
+            self.mission_ring.close()
+            self.mission_ring = None
         
         # 關閉線程池
         self.thread_pool.shutdown(wait=True)
-        if self.process_pool:
-            self.process_pool.shutdown(wait=True)
         
         logger.info("✅ 無人機模擬橋接器已停止")
     
+    def _refresh_connection_stats(self):
+        """在組件連接或斷開後更新統計快取"""
+        self._stats.update(
+            matlab_connected=self.matlab_bridge.is_connected,
+            mavlink_connected=self.mavlink_interface.is_connected if MAVLINK_AVAILABLE else False,
+            ros2_initialized=self.ros2_bridge.is_initialized if ROS2_AVAILABLE else False,
+            running=self.running
+        )
+    
+    def _on_websocket_clients_changed(self, count: int):
+        self._stats['websocket_clients'] = count
+    
     async def _main_loop(self):
         """主處理循環"""
         logger.info("🔄 主處理循環已啟動")
         
+        # 以單調時鐘的固定截止時間排程，週期不受每輪處理時間影響
+        deadline = time.monotonic()
+        
         while self.running:
             try:
                 # 處理數據隊列
                 self._process_data_queue()
                 
-                # 更新MATLAB模擬器
-                await self._update_matlab_simulation()
+                # 套用MAVLink最新數據
+                self._drain_mavlink_updates()
+                self._stats['connected_drones'] = len(self.drone_states)
                 
-                # 廣播數據到WebSocket客戶端
-                await self._broadcast_simulation_data()
-                
-                # 發送數據到ZMQ
-                self._send_zmq_data()
+                # 各輸出組件互不依賴，並行執行 (同步I/O與計算交由線程池)
+                loop = asyncio.get_event_loop()
+                await asyncio.gather(
+                    self._update_safety_conflicts(),
+                    self._update_matlab_simulation(),
+                    self._broadcast_simulation_data(),
+                    self._send_zmq_data(),
+                    loop.run_in_executor(self.thread_pool, self._update_ros2_topics)
+                )
                 
-                # 更新ROS2主題
-                self._update_ros2_topics()
+                deadline += self.update_interval
+                delay = deadline - time.monotonic()
+                if delay < 0:
+                    # 本輪超時: 記錄並重設基準，避免連續追趕
+                    self.overrun_count += 1
+                    logger.warning(f"主循環超時 {-delay * 1000:.1f}ms (累計{self.overrun_count}次)")
+                    deadline = time.monotonic()
+                    delay = 0
                 
-                await asyncio.sleep(self.update_interval)
+                await asyncio.sleep(delay)
                 
             except Exception as e:
                 logger.error(f"主循環錯誤: {e}")
                 await asyncio.sleep(1.0)
+                deadline = time.monotonic()
     
     def _process_data_queue(self):
         """處理數據隊列"""
-        processed_count = 0
+        matlab_batch = []
         
-        while not self.data_queue.empty() and processed_count < 10:
+        # 只處理本輪開始時已入隊的項目，避免生產者持續寫入時無法退出
+        for _ in range(len(self.data_queue)):
+            data_item = self.data_queue.popleft()
+            try:
+                entry = self._handlers.get(data_item.get('type'))
+                if entry is None:
+                    continue
+                
+                handler, on_matlab_thread = entry
+                if on_matlab_thread:
+                    # 需要MATLAB的項目收集起來，整批交給MATLAB線程
+                    matlab_batch.append(data_item)
+                else:
+                    handler(data_item['data'])
+            except Exception as e:
+                logger.error(f"數據處理錯誤: {e}")
+        
+        # 取走本輪累積的任務 (同一無人機多次上傳只處理最新一份)
+        ring_end = 0
+        if self._pending_missions:
+            with self._missions_lock:
+                missions, self._pending_missions = self._pending_missions, {}
+                # 此時head之前的記錄不是在本批次中，就是已被覆蓋的舊任務
+                if self.mission_ring:
+                    ring_end = self.mission_ring.head
+            matlab_batch.extend(
+                {'type': 'mission_waypoint', 'data': mission_data} for mission_data in missions.values()
+            )
+        
+        if matlab_batch:
+            self.matlab_executor.submit(self._process_matlab_batch, matlab_batch, ring_end)
+    
+    def _process_matlab_batch(self, batch: List[Dict], ring_end: int = 0):
+        """在MATLAB線程上依序處理一批數據項目，完成後釋放環形緩衝區至ring_end"""
+        for data_item in batch:
             try:
-                data_item = self.data_queue.get_nowait()
                 self._process_data_item(data_item)
-                processed_count += 1
-            except queue.Empty:
-                break
             except Exception as e:
                 logger.error(f"數據處理錯誤: {e}")
+        
+        if ring_end and self.mission_ring:
+            self.mission_ring.release(ring_end)
     
-    def _process_data_item(self, data_item: Dict):
-        """處理單個數據項目"""
-        data_type = data_item.get('type')
+    def _drain_mavlink_updates(self):
+        """批次套用MAVLink處理器寫入的最新數據"""
+        sys_ids = np.nonzero(self._mav_dirty)[0]
+        if not len(sys_ids):
+            return
+        
+        # 位置與姿態都到齊後才合併寫入一次，逾時則以現有部分數據寫入
+        now = time.monotonic()
+        flags = self._mav_dirty[sys_ids]
+        complete = (flags & MAV_KINEMATIC_BITS) == MAV_KINEMATIC_BITS
+        pending_since = self._mav_pending_since[sys_ids]
         
-        if data_type == 'drone_state':
-            self._update_drone_state(data_item['data'])
-        elif data_type == 'mission_waypoint':
-            self._update_mission_waypoints(data_item['data'])
-        elif data_type == 'matlab_command':
-            self._execute_matlab_command(data_item['data'])
+        waiting = ~complete & (pending_since == 0)
+        self._mav_pending_since[sys_ids[waiting]] = now
+        stale = ~complete & (pending_since > 0) & (now - pending_since >= MAVLINK_FUSE_TIMEOUT)
+        
+        ready = complete | stale
+        if not ready.any():
+            return
+        sys_ids, flags = sys_ids[ready], flags[ready]
+        
+        # 清除已套用系統的標記，處理器之後寫入的數據留待下一輪
+        self._mav_dirty[sys_ids] = 0
+        self._mav_pending_since[sys_ids] = 0
+        
+        table = self.drone_states
+        rows = self._mav_rows[sys_ids]
+        if (rows < 0).any():
+            # 新出現的系統只需解析一次列號
+            for sys_id in sys_ids[rows < 0].tolist():
+                self._mav_rows[sys_id] = table.row(self._mavlink_drone_id(sys_id))
+            rows = self._mav_rows[sys_ids]
+        table.timestamps[rows] = time.time()
+        table.version += 1
+        
+        has_pos = (flags & MAV_POS_BIT) != 0
+        if has_pos.any():
+            pos_rows, pos_sys = rows[has_pos], sys_ids[has_pos]
+            table.positions[pos_rows] = self._mav_pos[pos_sys, 0:3]
+            table.velocities[pos_rows] = self._mav_pos[pos_sys, 3:6]
+            table.geodetic[pos_rows] = True
+            table.has_position[pos_rows] = True
+        
+        has_att = (flags & MAV_ATT_BIT) != 0
+        if has_att.any():
+            table.attitudes[rows[has_att]] = self._mav_att[sys_ids[has_att]]
+        
+        has_status = (flags & MAV_STATUS_BIT) != 0
+        if has_status.any():
+            status_rows, status_sys = rows[has_status], sys_ids[has_status]
+            table.battery_voltage[status_rows] = self._mav_status[status_sys, 0]
+            table.armed[status_rows] = self._mav_status[status_sys, 1] != 0
+    
+    def _process_data_item(self, data_item: Dict):
+        """處理單個數據項目 (未知類型忽略)"""
+        entry = self._handlers.get(data_item.get('type'))
+        if entry:
+            entry[0](data_item['data'])
     
     def _update_drone_state(self, state_data: Dict):
         """更新無人機狀態"""
         drone_id = state_data['drone_id']
         
-        if drone_id not in self.drone_states:
-            self.drone_states[drone_id] = DroneState(drone_id=drone_id, timestamp=time.time())
-        
-        state = self.drone_states[drone_id]
-        state.timestamp = time.time()
+        table = self.drone_states
+        row = table.row(drone_id)
+        table.timestamps[row] = time.time()
+        table.version += 1
         
-        # 更新位置
+        # 直接寫入SoA陣列對應列
         if 'position' in state_data:
-            state.position = np.array(state_data['position'])
+            table.positions[row] = state_data['position']
+            table.geodetic[row] = False
+            table.has_position[row] = True
         
-        # 更新速度
         if 'velocity' in state_data:
-            state.velocity = np.array(state_data['velocity'])
+            table.velocities[row] = state_data['velocity']
         
-        # 更新姿態
         if 'attitude' in state_data:
-            state.attitude = np.array(state_data['attitude'])
+            table.attitudes[row] = state_data['attitude']
         
         # 更新其他狀態
-        for key in ['battery_voltage', 'flight_mode', 'armed', 'gps_fix']:
-            if key in state_data:
-                setattr(state, key, state_data[key])
+        if 'battery_voltage' in state_data:
+            table.battery_voltage[row] = state_data['battery_voltage']
+        if 'flight_mode' in state_data:
+            table.flight_modes[row] = state_data['flight_mode']
+        if 'armed' in state_data:
+            table.armed[row] = state_data['armed']
+        if 'gps_fix' in state_data:
+            table.gps_fix[row] = state_data['gps_fix']
+    
+    def _update_mission_waypoints(self, mission_data: Dict):
+        """更新MATLAB中的任務航點 (mission_data含環形緩衝區範圍，或 seq/lat/lon/alt/command 欄位陣列)"""
+        if not self.matlab_bridge.is_connected:
+            self._forget_matlab_mission(mission_data)
+            return
+        
+        try:
+            self.matlab_bridge.set_variable('wp_drone_id', mission_data['drone_id'])
+            
+            if 'ring_start' in mission_data:
+                # 航點已在共享記憶體中，只傳送範圍
+                if not self._matlab_ring_mapped:
+                    self.matlab_bridge.set_variable('mission_ring_path', mission_data['ring_path'])
+                    self.matlab_bridge.evaluate(_MATLAB_MAP_MISSION_RING, nargout=0)
+                    self._matlab_ring_mapped = True
+                self.matlab_bridge.set_variable('wp_start', float(mission_data['ring_start']))
+                self.matlab_bridge.set_variable('wp_count', float(mission_data['ring_count']))
+                self.matlab_bridge.evaluate(_MATLAB_READ_MISSION_RING, nargout=0)
+                return
+            
+            # 每欄以一個連續向量傳入，由MATLAB端拼為 N x 5 [sequence, lat, lon, alt, command] 矩陣
+            for key, _, _ in WAYPOINT_COLUMNS:
+                self.matlab_bridge.set_variable(f'wp_{key}', np_to_mldouble(mission_data[key]))
+            self.matlab_bridge.evaluate(
+                'update_mission_from_python(wp_drone_id, [wp_seq(:), wp_lat(:), wp_lon(:), wp_alt(:), wp_command(:)]);',
+                nargout=0
+            )
+        except Exception as e:
+            self._forget_matlab_mission(mission_data)
+            logger.error(f"MATLAB任務更新失敗: {e}")
+    
+    def _forget_matlab_mission(self, mission_data: Dict):
+        """MATLAB未收到任務時撤銷去重記錄，讓相同任務可重新發送"""
+        key = ('matlab', mission_data['drone_id'])
+        if self._mission_delivered.get(key) == mission_data.get('digest'):
+            self._mission_delivered.pop(key, None)
+    
+    async def _update_safety_conflicts(self):
+        """在線程池中更新安全衝突 (結果只供WebSocket廣播，與廣播並行故於下一輪送出；無客戶端時不計算)"""
+        if not self.websocket_server.clients:
+            self.safety_conflicts = []
+            return
+        
+        await asyncio.get_event_loop().run_in_executor(self.thread_pool, self._check_safety_distances)
+    
+    def _check_safety_distances(self):
+        """檢查所有無人機的安全距離 (MAVLink經緯度位置先轉為本地米制座標；兩種座標系的無人機不互相比較，尚無位置者略過)"""
+        try:
+            table = self.drone_states
+            n = len(table)
+            conflicts = np.zeros(n, dtype=bool)
+            geodetic = table.geodetic[:n]
+            has_position = table.has_position[:n]
+            
+            for rows, to_metres in ((np.flatnonzero(has_position & geodetic), geodetic_to_enu),
+                                    (np.flatnonzero(has_position & ~geodetic), None)):
+                if len(rows) < 2:
+                    continue
+                positions = table.positions[rows]
+                if to_metres:
+                    positions = to_metres(positions)
+                conflicts[rows] = self.safety_checker.find_conflicts(positions)
+            
+            self.safety_conflicts = [table.ids[row] for row in np.nonzero(conflicts)[0].tolist()]
+        except Exception as e:
+            logger.error(f"安全距離檢查錯誤: {e}")
+    
+    def _mavlink_drone_id(self, sys_id: int) -> str:
+        """獲取MAVLink系統對應的無人機ID"""
+        drone_id = self._sys_to_id.get(sys_id)
+        if drone_id is None:
+            drone_id = sys.intern(f"mavlink_{sys_id}")
+            self._sys_to_id[sys_id] = drone_id
+            self._id_to_sys[drone_id] = sys_id
+        return drone_id
+    
+    def _target_system(self, drone_id: str) -> int:
+        """獲取無人機ID對應的MAVLink系統ID"""
+        target_system = self._id_to_sys.get(drone_id)
+        if target_system is None:
+            target_system = int(drone_id.split('_')[-1]) if '_' in drone_id else 1
+            self._id_to_sys[drone_id] = target_system
+        return target_system
     
     async def _update_matlab_simulation(self):
         """更新MATLAB模擬"""
@@ -677,43 +1685,51 @@ class DroneSimulationBridge:
             return
         
         try:
-            # 獲取當前模擬時間
-            current_time = await asyncio.get_event_loop().run_in_executor(
-                self.thread_pool,
-                self.matlab_bridge.evaluate,
-                'simulator.current_time'
-            )
+            # 獲取模擬器數據供下一輪廣播使用 (管線化，廣播無需等待MATLAB；無客戶端時不取)
+            if self.websocket_server.clients:
+                self._matlab_data = await asyncio.get_event_loop().run_in_executor(
+                    self.matlab_executor,
+                    self._get_matlab_simulation_data
+                )
+            else:
+                self._matlab_data = {}
             
-            # 更新模擬器狀態 (如果有新數據)
-            if self.drone_states:
-                state_data = {
-                    drone_id: {
-                        'position': state.position.tolist(),
-                        'velocity': state.velocity.tolist(),
-                        'attitude': state.attitude.tolist(),
-                        'timestamp': state.timestamp
-                    }
-                    for drone_id, state in self.drone_states.items()
-                }
-                
+            # 更新模擬器狀態 (僅在上次成功推送後有新數據時，失敗時下一輪重試)
+            table = self.drone_states
+            version = table.version
+            if table and version != self._matlab_state_version:
                 # 異步調用MATLAB更新函數
-                await asyncio.get_event_loop().run_in_executor(
-                    self.thread_pool,
+                if await asyncio.get_event_loop().run_in_executor(
+                    self.matlab_executor,
                     self._update_matlab_drone_states,
-                    state_data
-                )
+                    list(table.ids),
+                    table.pack_state_buffer()
+                ):
+                    self._matlab_state_version = version
                 
         except Exception as e:
             logger.error(f"MATLAB模擬更新錯誤: {e}")
     
-    def _update_matlab_drone_states(self, state_data: Dict):
-        """更新MATLAB中的無人機狀態"""
+    def _update_matlab_drone_states(self, drone_ids: List[str], state_buffer: np.ndarray) -> bool:
+        """更新MATLAB中的無人機狀態 (state_buffer為 N x 10 [position, velocity, attitude, timestamp])，返回是否成功"""
         try:
-            # 將Python字典轉換為MATLAB可接受的格式
-            json_str = json.dumps(state_data)
-            self.matlab_bridge.evaluate(f"update_drone_states_from_python('{json_str}')")
+            # 直接寫入工作區變數，避免JSON序列化與字串插值解析
+            self.matlab_bridge.set_variable('ds_ids', drone_ids)
+            
+            if len(state_buffer) >= MATLAB_B64_THRESHOLD:
+                # 大量數據以base64傳輸原始位元組，由MATLAB端typecast還原
+                self.matlab_bridge.set_variable(
+                    'ds_b64', base64.b64encode(state_buffer.tobytes()).decode('ascii')
+                )
+                self.matlab_bridge.evaluate(_MATLAB_DECODE_STATE_BUFFER, nargout=0)
+            else:
+                self.matlab_bridge.set_variable('ds_buf', np_to_mldouble(state_buffer))
+            
+            self.matlab_bridge.evaluate('update_drone_states_from_buffer(ds_ids, ds_buf);', nargout=0)
+            return True
         except Exception as e:
             logger.error(f"MATLAB狀態更新失敗: {e}")
+            return False
     
     async def _broadcast_simulation_data(self):
         """廣播模擬數據"""
@@ -721,32 +1737,39 @@ class DroneSimulationBridge:
             return
         
         try:
-            # 準備廣播數據
+            # 準備廣播數據 (每個欄位整批轉換一次)
+            table = self.drone_states
+            n = len(table)
             broadcast_data = {
                 'timestamp': time.time(),
                 'drone_states': {
                     drone_id: {
-                        'position': state.position.tolist(),
-                        'velocity': state.velocity.tolist(),
-                        'attitude': state.attitude.tolist(),
-                        'battery_voltage': state.battery_voltage,
-                        'flight_mode': state.flight_mode,
-                        'armed': state.armed
+                        'position': position,
+                        'velocity': velocity,
+                        'attitude': attitude,
+                        'battery_voltage': battery_voltage,
+                        'flight_mode': flight_mode,
+                        'armed': armed
                     }
-                    for drone_id, state in self.drone_states.items()
-                }
+                    for drone_id, position, velocity, attitude, battery_voltage, flight_mode, armed in zip(
+                        table.ids,
+                        table.positions[:n].tolist(),
+                        table.velocities[:n].tolist(),
+                        table.attitudes[:n].tolist(),
+                        table.battery_voltage[:n].tolist(),
+                        table.flight_modes,
+                        table.armed[:n].tolist()
+                    )
+                },
+                'safety_conflicts': self.safety_conflicts
             }
             
-            # 獲取MATLAB模擬器數據
-            if self.matlab_bridge.is_connected:
-                matlab_data = await asyncio.get_event_loop().run_in_executor(
-                    self.thread_pool,
-                    self._get_matlab_simulation_data
-                )
-                broadcast_data['matlab_simulation'] = matlab_data
+            # 附加上一輪取得的MATLAB模擬器數據
+            if self.matlab_bridge.is_connected and self._matlab_data:
+                broadcast_data['matlab_simulation'] = self._matlab_data
             
-            # 廣播到WebSocket客戶端
-            await self.websocket_server.broadcast_data(broadcast_data)
+            # 編碼一次後廣播到WebSocket客戶端
+            await self.websocket_server.broadcast_data(self._ws_encode(broadcast_data))
             
         except Exception as e:
             logger.error(f"廣播錯誤: {e}")
@@ -754,33 +1777,41 @@ class DroneSimulationBridge:
     def _get_matlab_simulation_data(self) -> Dict:
         """獲取MATLAB模擬數據"""
         try:
-            # 獲取基本模擬信息
-            current_time = self.matlab_bridge.evaluate('simulator.current_time')
-            is_playing = self.matlab_bridge.evaluate('simulator.is_playing')
+            # 一次取回基本模擬信息 [current_time, is_playing]
+            values = mldouble_to_np(self.matlab_bridge.evaluate(
+                '[simulator.current_time, double(simulator.is_playing)]'
+            )).ravel()
             
             return {
-                'current_time': current_time,
-                'is_playing': bool(is_playing),
+                'current_time': float(values[0]),
+                'is_playing': bool(values[1]),
                 'drone_count': len(self.drone_states)
             }
         except Exception as e:
             logger.error(f"獲取MATLAB數據失敗: {e}")
             return {}
     
-    def _send_zmq_data(self):
+    async def _send_zmq_data(self):
         """通過ZMQ發送數據"""
         try:
-            if self.drone_states:
+            # 沒有訂閱者時跳過序列化與發送
+            await self.zmq_communicator.update_subscriptions()
+            if not self.zmq_communicator.has_subscribers('simulation_update'):
+                return
+            
+            table = self.drone_states
+            if table:
+                n = len(table)
                 zmq_data = {
                     'timestamp': time.time(),
-                    'drone_count': len(self.drone_states),
-                    'positions': {
-                        drone_id: state.position.tolist()
-                        for drone_id, state in self.drone_states.items()
-                    }
+                    'drone_count': n,
+                    'drone_ids': table.ids
                 }
                 
-                self.zmq_communicator.send_data('simulation_update', zmq_data)
+                # 位置以 (N, 3) float64原始緩衝區單獨成幀，列順序與drone_ids一致
+                await self.zmq_communicator.send_data(
+                    'simulation_update', zmq_data, arrays={'positions': table.positions[:n]}
+                )
                 
         except Exception as e:
             logger.error(f"ZMQ發送錯誤: {e}")
@@ -792,11 +1823,13 @@ class DroneSimulationBridge:
         
         try:
             # 發布無人機路徑
-            for drone_id, state in self.drone_states.items():
+            table = self.drone_states
+            n = len(table)
+            for drone_id, position in zip(table.ids, table.positions[:n].tolist()):
                 topic = f'/drone_sim/{drone_id}/path'
                 
                 # 簡化的路徑數據 (只包含當前位置)
-                waypoints = [tuple(state.position)]
+                waypoints = [tuple(position)]
                 self.ros2_bridge.publish_drone_path(topic, waypoints)
                 
         except Exception as e:
@@ -805,67 +1838,39 @@ class DroneSimulationBridge:
     # MAVLink消息處理器
     def _handle_mavlink_position(self, msg):
         """處理MAVLink位置消息"""
-        drone_id = f"mavlink_{msg.get_srcSystem()}"
-        
-        position_data = {
-            'drone_id': drone_id,
-            'position': [
-                msg.lat / 1e7,  # 緯度
-                msg.lon / 1e7,  # 經度  
-                msg.alt / 1000.0  # 高度 (轉換為米)
-            ],
-            'velocity': [
-                msg.vx / 100.0,  # 速度 (cm/s -> m/s)
-                msg.vy / 100.0,
-                msg.vz / 100.0
-            ]
-        }
-        
-        self.data_queue.put({
-            'type': 'drone_state',
-            'data': position_data
-        })
+        sys_id = msg.get_srcSystem()
+        self._mav_pos[sys_id] = (
+            msg.lat / 1e7,  # 緯度
+            msg.lon / 1e7,  # 經度
+            msg.alt / 1000.0,  # 高度 (轉換為米)
+            msg.vx / 100.0,  # 速度 (cm/s -> m/s)
+            msg.vy / 100.0,
+            msg.vz / 100.0
+        )
+        self._mav_dirty[sys_id] |= MAV_POS_BIT
     
     def _handle_mavlink_attitude(self, msg):
         """處理MAVLink姿態消息"""
-        drone_id = f"mavlink_{msg.get_srcSystem()}"
-        
-        attitude_data = {
-            'drone_id': drone_id,
-            'attitude': [
-                msg.roll,
-                msg.pitch,
-                msg.yaw
-            ]
-        }
-        
-        self.data_queue.put({
-            'type': 'drone_state',
-            'data': attitude_data
-        })
+        sys_id = msg.get_srcSystem()
+        self._mav_att[sys_id] = (msg.roll, msg.pitch, msg.yaw)
+        self._mav_dirty[sys_id] |= MAV_ATT_BIT
     
     def _handle_mavlink_status(self, msg):
         """處理MAVLink狀態消息"""
-        drone_id = f"mavlink_{msg.get_srcSystem()}"
-        
-        status_data = {
-            'drone_id': drone_id,
-            'battery_voltage': msg.voltage_battery / 1000.0,  # mV -> V
-            'armed': bool(msg.onboard_control_sensors_enabled & 0x80000000)
-        }
-        
-        self.data_queue.put({
-            'type': 'drone_state',
-            'data': status_data
-        })
+        sys_id = msg.get_srcSystem()
+        self._mav_status[sys_id] = (
+            msg.voltage_battery / 1000.0,  # mV -> V
+            bool(msg.onboard_control_sensors_enabled & 0x80000000)
+        )
+        self._mav_dirty[sys_id] |= MAV_STATUS_BIT
     
     # ROS2消息處理器
     def _handle_ros2_command(self, msg):
         """處理ROS2命令消息"""
         try:
-            command_data = json.loads(msg.data)
+            command_data = _loads(msg.data)
             
-            self.data_queue.put({
+            self.data_queue.append({
                 'type': 'matlab_command',
                 'data': command_data
             })
@@ -890,6 +1895,7 @@ class DroneSimulationBridge:
                 self.matlab_bridge.call_function('load_qgc_file', mission_file)
             elif command_type == 'set_safety_distance':
                 distance = command_data.get('distance', 5.0)
+                self.safety_checker.safety_distance = distance
                 self.matlab_bridge.evaluate(f'simulator.safety_distance = {distance}')
                 
         except Exception as e:
@@ -909,53 +1915,86 @@ class DroneSimulationBridge:
         if attitude:
             state_data['attitude'] = attitude
         
-        self.data_queue.put({
+        self.data_queue.append({
             'type': 'drone_state',
             'data': state_data
         })
     
     def send_mission_to_drone(self, drone_id: str, waypoints: List[MissionWaypoint]):
-        """發送任務到無人機"""
-        if MAVLINK_AVAILABLE and self.mavlink_interface.is_connected:
+        """發送任務到無人機 (航點座標超出範圍時拋出ValueError)"""
+        columns = waypoint_columns(waypoints)
+        bad = first_invalid_waypoint(columns['lat'], columns['lon'], columns['alt'])
+        if bad >= 0:
+            wp = waypoints[bad]
+            raise ValueError(f"無效航點 #{wp.sequence}: lat={wp.lat}, lon={wp.lon}, alt={wp.alt}")
+        
+        # 存儲任務數據 (連續結構化陣列，不保留航點物件)
+        self.mission_waypoints[drone_id] = waypoint_records(columns)
+        
+        # 各通道分別去重: 只略過該通道已成功送達的相同內容，未送達的通道照常重試
+        digest = mission_digest(waypoints, columns)
+        delivered = self._mission_delivered
+        
+        if MAVLINK_AVAILABLE and self.mavlink_interface.is_connected and delivered.get(('mavlink', drone_id)) != digest:
             # 通過MAVLink發送
-            target_system = int(drone_id.split('_')[-1]) if '_' in drone_id else 1
-            self.mavlink_interface.send_waypoint_mission(waypoints, target_system)
-        
-        # 存儲任務數據
-        self.mission_waypoints[drone_id] = waypoints
-        
-        # 更新MATLAB模擬器
-        self.data_queue.put({
-            'type': 'mission_waypoint',
-            'data': {
-                'drone_id': drone_id,
-                'waypoints': [
-                    {
-                        'sequence': wp.sequence,
-                        'lat': wp.lat,
-                        'lon': wp.lon,
-                        'alt': wp.alt,
-                        'command': wp.command
-                    }
-                    for wp in waypoints
-                ]
-            }
-        })
+            target_system = self._target_system(drone_id)
+            if self.mavlink_interface.send_waypoint_mission(waypoints, target_system):
+                delivered[('mavlink', drone_id)] = digest
+        
+        # 發布到ROS2任務主題
+        if ROS2_AVAILABLE and self.ros2_bridge.is_initialized and delivered.get(('ros2', drone_id)) != digest:
+            try:
+                self.ros2_bridge.publish_mission_path(
+                    f'/drone_sim/{drone_id}/mission',
+                    [(wp.lat, wp.lon, wp.alt) for wp in waypoints]
+                )
+                delivered[('ros2', drone_id)] = digest
+            except Exception as e:
+                logger.error(f"ROS2任務發布失敗: {e}")
+        
+        # 經ZMQ任務通道發送給外部接收端
+        if delivered.get(('zmq', drone_id)) != digest and self.zmq_communicator.send_mission(drone_id, columns):
+            delivered[('zmq', drone_id)] = digest
+        
+        if not self.matlab_bridge.is_connected or delivered.get(('matlab', drone_id)) == digest:
+            return
+        delivered[('matlab', drone_id)] = digest
+        
+        # 更新MATLAB模擬器 (優先寫入共享記憶體環，只傳範圍；空間不足時傳欄位陣列)
+        # 環寫入與登記在同一把鎖內，保證每批次取走的範圍早於之後寫入的範圍
+        with self._missions_lock:
+            ring = self.mission_ring
+            written = ring.write(drone_id, columns) if ring is not None else None
+            if written is not None:
+                start, count = written
+                mission_data = {'drone_id': drone_id, 'ring_path': ring.path,
+                                'ring_start': start, 'ring_count': count}
+            else:
+                mission_data = dict(columns, drone_id=drone_id)
+            mission_data['digest'] = digest
+            self._pending_missions[drone_id] = mission_data
     
     def get_drone_states(self) -> Dict[str, DroneState]:
-        """獲取所有無人機狀態"""
-        return self.drone_states.copy()
+        """獲取所有無人機狀態 (返回共享的唯讀快照，調用方不可修改)"""
+        with self._states_lock:
+            table = self.drone_states
+            if self._states_snapshot_version != table.version:
+                # 狀態表有新寫入時才重建快照
+                self._states_snapshot = dict(table.items())
+                self._states_snapshot_version = table.version
+            return self._states_snapshot
+    
+    def get_mission(self, drone_id: str) -> Optional[np.ndarray]:
+        """獲取無人機最近一次的任務 (WP_DTYPE結構化陣列，需要Python物件時調用tolist())"""
+        return self.mission_waypoints.get(drone_id)
+    
+    def iter_drone_states(self):
+        """迭代 (drone_id, DroneState)，直接走訪共享快照 (狀態未變時不重建任何物件，迭代期間不持鎖)"""
+        return iter(self.get_drone_states().items())
     
     def get_simulation_stats(self) -> Dict[str, Any]:
-        """獲取模擬統計信息"""
-        return {
-            'connected_drones': len(self.drone_states),
-            'matlab_connected': self.matlab_bridge.is_connected,
-            'mavlink_connected': self.mavlink_interface.is_connected if MAVLINK_AVAILABLE else False,
-            'ros2_initialized': self.ros2_bridge.is_initialized if ROS2_AVAILABLE else False,
-            'websocket_clients': len(self.websocket_server.clients),
-            'running': self.running
-        }
+        """獲取模擬統計信息 (返回快取的淺複製)"""
+        return self._stats.copy()
 
 # 使用示例和測試函數
 async def demo_bridge_usage():
@@ -987,5 +2026,10 @@ async def demo_bridge_usage():
         await bridge.stop()
 
 if __name__ == "__main__":
-    # 運行演示
-    asyncio.run(demo_bridge_usage())
\ No newline at end of file
+    # 運行演示 (可用時使用uvloop事件循環)
+    if UVLOOP_AVAILABLE and sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(demo_bridge_usage())
+    else:
+        DroneSimulationBridge.install_fast_loop()
+        asyncio.run(demo_bridge_usage())
\ No newline at end of file